@@ -15,15 +15,45 @@ from bs4 import BeautifulSoup
 import sys
 import re
 import json
+import hashlib
+import sqlite3
+import threading
 import argparse
+from concurrent.futures import FIRST_EXCEPTION, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice, repeat
 import requests
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Concurrent tag requests; match Ollama's OLLAMA_NUM_PARALLEL setting
+OLLAMA_NUM_PARALLEL = int(os.environ.get('OLLAMA_NUM_PARALLEL', '4'))
+
+# Per-request timeout for tag generation; a request may wait behind up to
+# OLLAMA_NUM_PARALLEL others if the server runs fewer slots than we send
+OLLAMA_TAG_TIMEOUT = 30 * OLLAMA_NUM_PARALLEL
+
+# Shared keep-alive session so tag requests reuse pooled connections
+OLLAMA_SESSION = requests.Session()
+OLLAMA_SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=OLLAMA_NUM_PARALLEL))
+
+# Read/write buffer for large JSON files (default is 8 KiB)
+IO_BUFFER_SIZE = 1 << 20
+
+# Reused stdlib JSON codecs for when orjson is not installed
+JSON_DECODER = json.JSONDecoder()
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+JSON_INDENT_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, indent=2)
+
 
 def check_ollama_available():
     """Check if Ollama is running and has the required model."""
     try:
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
+        response = OLLAMA_SESSION.get('http://localhost:11434/api/tags', timeout=5)
         if response.status_code != 200:
             return False, "Ollama is not responding correctly"
 
@@ -41,6 +71,35 @@ def check_ollama_available():
         return False, f"Error checking Ollama: {e}"
 
 
+def load_json(path):
+    """Read a JSON file, using orjson when it is installed."""
+    # Unbuffered: readall() sizes its buffer from fstat and reads in one go
+    with open(path, 'rb', buffering=0) as f:
+        data = f.readall()
+    if orjson is not None:
+        return orjson.loads(data)
+    return JSON_DECODER.decode(data.decode('utf-8'))
+
+
+def dump_json(obj, path, indent=True):
+    """
+    Write obj to path as UTF-8 JSON, using orjson when it is installed.
+
+    Pass indent=False for machine-read files to skip the whitespace.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    else:
+        encoder = JSON_INDENT_ENCODER if indent else JSON_ENCODER
+        payload = encoder.encode(obj).encode('utf-8')
+    # Write to a temp file and rename over the target so a crash mid-write
+    # never leaves a truncated file behind
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
 # Chapter detection configuration
 CHAPTER_DETECTION_CONFIG = {
     'enable_html_normalization': True,
@@ -92,16 +151,117 @@ BIBLIOGRAPHY_CITATION_PATTERNS = [
     r'(New York|London|Paris|Oxford|Cambridge|Chicago|Boston):\s*\w+',
 ]
 
+# Compiled once at import; title patterns are unioned so one match() covers them all
+TOC_TITLE_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in TOC_TITLE_PATTERNS))
+TOC_LIST_LINE_RE = re.compile(r'(?:\d+|[IVX]+)\.')
+BIBLIOGRAPHY_TITLE_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in BIBLIOGRAPHY_TITLE_PATTERNS))
+# Kept separate: a citation line is one matching at least two *different* patterns
+BIBLIOGRAPHY_CITATION_RES = [re.compile(pattern) for pattern in BIBLIOGRAPHY_CITATION_PATTERNS]
+AUTHOR_NAME_RE = re.compile(r'\b[A-Z][a-z]+,\s*[A-Z]')  # "Smith, J."
+CITATION_YEAR_RE = re.compile(r'\([12]\d{3}\)')
+ISBN_RE = re.compile(r'isbn:\s*978-[\d-]+')
+URL_RE = re.compile(r'(?:[a-zA-Z0-9-]+\.)+(?:com|org|net|edu|gov|io|co\.uk)')
+
+# HTML chapter marker patterns, in priority order (see normalize_chapter_markers)
+CHAPTER_MARKER_PATTERNS = [
+    # Pattern 1: Roman numeral with optional period + title
+    # Matches: "II. Specialisation", "IISpecialisation", "III Introduction"
+    {
+        'regex': re.compile(
+            r'^([IVX]{1,10})\.?\s*([A-Z][a-zA-Z\s].*)?$'
+        ),
+        'level': 2,
+        'name': 'roman_numeral'
+    },
+
+    # Pattern 2: Arabic numeral with period + title
+    # Matches: "1. Hyperactivity", "10. Creative Play", "1. Trauma & anxiety"
+    {
+        'regex': re.compile(r'^(\d{1,3})\.\s+([A-Z][A-Za-z\s&\-:,]{3,})$'),
+        'level': 2,
+        'name': 'arabic_numeral'
+    },
+
+    # Pattern 3: "Chapter" keyword patterns
+    # Matches: "Chapter 1", "CHAPTER ONE", "Chapter One: Title"
+    {
+        'regex': re.compile(
+            r'^(Chapter|CHAPTER)\s+([IVX]{1,10}|\d{1,3}|One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten)'
+            r'(:?\s*[A-Z].*)?$'
+        ),
+        'level': 2,
+        'name': 'chapter_keyword'
+    },
+
+    # Pattern 4: "Part" keyword patterns
+    # Matches: "Part I", "PART TWO", "Part 1: The Problem"
+    {
+        'regex': re.compile(
+            r'^(Part|PART)\s+([IVX]{1,10}|\d{1,3}|One|Two|Three|Four|Five|ONE|TWO|THREE|FOUR|FIVE)'
+            r'(:?\s*[A-Z].*)?$'
+        ),
+        'level': 2,
+        'name': 'part_keyword'
+    },
+
+    # Pattern 5: ALL-CAPS subsections
+    # Matches: "SELF-HATRED & ANXIETY", "TRAUMA EXERCISE"
+    {
+        'regex': re.compile(r'^([A-Z][A-Z\s&\-]{8,60})$'),
+        'level': 2,
+        'name': 'all_caps_subsection',
+        'validator': lambda text: (
+            # Must be 8-60 chars (not too short like "OK", not full sentences)
+            8 <= len(text) <= 60 and
+            # Must be mostly letters (at least 70%)
+            sum(c.isalpha() for c in text) / len(text) >= 0.7
+        )
+    }
+]
+
+# All marker patterns as one named alternation: a single match() per <p>, and
+# m.lastgroup names the first pattern (in priority order) that matched
+CHAPTER_MARKER_RE = re.compile('^(?:' + '|'.join(
+    f"(?P<{pattern['name']}>{pattern['regex'].pattern[1:-1]})"
+    for pattern in CHAPTER_MARKER_PATTERNS
+) + ')$')
+CHAPTER_MARKERS_BY_NAME = {pattern['name']: pattern for pattern in CHAPTER_MARKER_PATTERNS}
+
+# "IISpecialisation" -> "II. Specialisation"
+ROMAN_RUN_IN_RE = re.compile(r'^([IVX]+)([A-Z][a-z])')
+
+# Same patterns as HTML normalization, but operating on markdown text. One
+# MULTILINE regex matches a whole chapter-marker line; the title group is the
+# line minus surrounding whitespace. Whitespace inside the patterns excludes
+# newlines so a match never spans lines.
+MARKDOWN_CHAPTER_LINE_RE = re.compile(
+    r'^[^\S\n]*(?P<title>'
+    # Roman numeral patterns
+    r'[IVX]{1,10}\.?[^\S\n]+[A-Z][a-zA-Z].*'
+    # Arabic numeral patterns (WITH PUNCTUATION)
+    r'|\d{1,3}\.[^\S\n]+[A-Z](?:(?!\n)[A-Za-z\s&\-:,]){3,}'
+    # ALL-CAPS subsections
+    r'|[A-Z](?:(?!\n)[A-Z\s&\-]){8,60}'
+    # Chapter/Part keywords (case-insensitive for word numbers)
+    r'|(?:Chapter|CHAPTER|Part|PART)[^\S\n]+(?:[IVX\d]+|One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten|ONE|TWO|THREE|FOUR|FIVE|SIX|SEVEN|EIGHT|NINE|TEN).*'
+    r')(?<=\S)[^\S\n]*$',
+    re.MULTILINE
+)
+
+
+# Tags html_to_markdown converts
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+MARKDOWN_TAGS = [*HEADING_TAGS, 'p', 'li', 'blockquote', 'br']
+
 
 def html_to_markdown(soup):
     """Convert BeautifulSoup HTML to markdown, preserving structure."""
     markdown_lines = []
 
-    for element in soup.descendants:
-        if element.name is None:
-            continue
-
-        if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+    # find_all walks tags only (in document order), skipping the text nodes
+    # that soup.descendants would also yield
+    for element in soup.find_all(MARKDOWN_TAGS):
+        if element.name in HEADING_TAGS:
             level = int(element.name[1])
             text = element.get_text().strip()
             if text:
@@ -142,69 +302,12 @@ def normalize_chapter_markers(soup):
     - Arabic numerals: "1. Chapter Title", "2.", "Chapter 3"
     - Keywords: "Chapter One", "CHAPTER 1", "Part II"
 
-    Returns: Modified BeautifulSoup object with normalized headers
+    Returns: (modified BeautifulSoup object, conversions per pattern name)
     """
     if not CHAPTER_DETECTION_CONFIG['enable_html_normalization']:
-        return soup
-
-    # Pattern definitions with priority order
-    patterns = [
-        # Pattern 1: Roman numeral with optional period + title
-        # Matches: "II. Specialisation", "IISpecialisation", "III Introduction"
-        {
-            'regex': re.compile(
-                r'^([IVX]{1,10})\.?\s*([A-Z][a-zA-Z\s].*)?$'
-            ),
-            'level': 2,
-            'name': 'roman_numeral'
-        },
-
-        # Pattern 2: Arabic numeral with period + title
-        # Matches: "1. Hyperactivity", "10. Creative Play", "1. Trauma & anxiety"
-        {
-            'regex': re.compile(r'^(\d{1,3})\.\s+([A-Z][A-Za-z\s&\-:,]{3,})$'),
-            'level': 2,
-            'name': 'arabic_numeral'
-        },
-
-        # Pattern 3: "Chapter" keyword patterns
-        # Matches: "Chapter 1", "CHAPTER ONE", "Chapter One: Title"
-        {
-            'regex': re.compile(
-                r'^(Chapter|CHAPTER)\s+([IVX]{1,10}|\d{1,3}|One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten)'
-                r'(:?\s*[A-Z].*)?$'
-            ),
-            'level': 2,
-            'name': 'chapter_keyword'
-        },
-
-        # Pattern 4: "Part" keyword patterns
-        # Matches: "Part I", "PART TWO", "Part 1: The Problem"
-        {
-            'regex': re.compile(
-                r'^(Part|PART)\s+([IVX]{1,10}|\d{1,3}|One|Two|Three|Four|Five|ONE|TWO|THREE|FOUR|FIVE)'
-                r'(:?\s*[A-Z].*)?$'
-            ),
-            'level': 2,
-            'name': 'part_keyword'
-        },
-
-        # Pattern 5: ALL-CAPS subsections
-        # Matches: "SELF-HATRED & ANXIETY", "TRAUMA EXERCISE"
-        {
-            'regex': re.compile(r'^([A-Z][A-Z\s&\-]{8,60})$'),
-            'level': 2,
-            'name': 'all_caps_subsection',
-            'validator': lambda text: (
-                # Must be 8-60 chars (not too short like "OK", not full sentences)
-                8 <= len(text) <= 60 and
-                # Must be mostly letters (at least 70%)
-                sum(c.isalpha() for c in text) / len(text) >= 0.7
-            )
-        }
-    ]
+        return soup, {}
 
-    conversions = {pattern['name']: 0 for pattern in patterns}
+    conversions = {pattern['name']: 0 for pattern in CHAPTER_MARKER_PATTERNS}
 
     # Iterate through all <p> tags
     for p_tag in soup.find_all('p'):
@@ -214,26 +317,32 @@ def normalize_chapter_markers(soup):
         if not text or len(text) > 100:
             continue
 
-        # Check against each pattern
-        for pattern_def in patterns:
-            match = pattern_def['regex'].match(text)
-            if match:
-                # Check validator if present
-                if 'validator' in pattern_def and not pattern_def['validator'](text):
-                    continue  # Skip this match
-
-                # Handle edge case: "IISpecialisation" → inject space
-                if pattern_def['name'] == 'roman_numeral':
-                    text = re.sub(r'^([IVX]+)([A-Z][a-z])', r'\1. \2', text)
-
-                # Convert <p> to <h2> (or appropriate level)
-                new_tag = soup.new_tag(f"h{pattern_def['level']}")
-                new_tag.string = text
-                p_tag.replace_with(new_tag)
-                conversions[pattern_def['name']] += 1
-                break  # Stop after first match
-
-    # Print diagnostic output
+        # Check against all patterns at once
+        match = CHAPTER_MARKER_RE.match(text)
+        if not match:
+            continue
+        pattern_def = CHAPTER_MARKERS_BY_NAME[match.lastgroup]
+
+        # Check validator if present (only the last pattern has one, so a
+        # rejected match never falls through to another pattern)
+        if 'validator' in pattern_def and not pattern_def['validator'](text):
+            continue
+
+        # Handle edge case: "IISpecialisation" → inject space
+        if pattern_def['name'] == 'roman_numeral':
+            text = ROMAN_RUN_IN_RE.sub(r'\1. \2', text)
+
+        # Convert <p> to <h2> (or appropriate level)
+        new_tag = soup.new_tag(f"h{pattern_def['level']}")
+        new_tag.string = text
+        p_tag.replace_with(new_tag)
+        conversions[pattern_def['name']] += 1
+
+    return soup, conversions
+
+
+def print_chapter_conversions(conversions):
+    """Print normalize_chapter_markers' diagnostic output for one document."""
     total_conversions = sum(conversions.values())
     if total_conversions > 0:
         print(f"  HTML normalization: {total_conversions} chapters detected")
@@ -241,8 +350,6 @@ def normalize_chapter_markers(soup):
             if count > 0:
                 print(f"    - {name}: {count}")
 
-    return soup
-
 
 def normalize_markdown_headers(markdown_content):
     """
@@ -258,42 +365,26 @@ def normalize_markdown_headers(markdown_content):
     if not CHAPTER_DETECTION_CONFIG['enable_markdown_normalization']:
         return markdown_content
 
-    lines = markdown_content.split('\n')
-    normalized_lines = []
-
-    # Same patterns as HTML normalization, but operating on markdown text
-    chapter_patterns = [
-        # Roman numeral patterns
-        re.compile(r'^([IVX]{1,10})\.?\s+([A-Z][a-zA-Z].*)$'),
-        # Arabic numeral patterns (WITH PUNCTUATION)
-        re.compile(r'^(\d{1,3})\.\s+([A-Z][A-Za-z\s&\-:,]{3,})$'),
-        # ALL-CAPS subsections (NEW)
-        re.compile(r'^([A-Z][A-Z\s&\-]{8,60})$'),
-        # Chapter/Part keywords (case-insensitive for word numbers)
-        re.compile(r'^(Chapter|CHAPTER|Part|PART)\s+([IVX\d]+|One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten|ONE|TWO|THREE|FOUR|FIVE|SIX|SEVEN|EIGHT|NINE|TEN).*$')
-    ]
+    # Convert matching lines to H2 headers in one pass; lines already starting
+    # with '#' never match since every pattern starts with a letter or digit
+    return MARKDOWN_CHAPTER_LINE_RE.sub(r'## \g<title>', markdown_content)
 
-    for line in lines:
-        stripped = line.strip()
 
-        # Skip if already a header or empty line
-        if stripped.startswith('#') or not stripped:
-            normalized_lines.append(line)
-            continue
+def document_to_markdown(content):
+    """Convert one EPUB HTML document to markdown.
 
-        # Check if line matches chapter pattern
-        matched = False
-        for pattern in chapter_patterns:
-            if pattern.match(stripped):
-                # Convert to H2 header
-                normalized_lines.append(f"## {stripped}")
-                matched = True
-                break
+    Runs in a worker process, so it returns the chapter-marker conversions
+    for the parent to print instead of printing them itself.
+    """
+    soup = BeautifulSoup(content, 'lxml')  # C parser; much faster than html.parser
 
-        if not matched:
-            normalized_lines.append(line)
+    for script in soup(["script", "style"]):
+        script.decompose()
 
-    return '\n'.join(normalized_lines)
+    # Layer 1: Normalize chapter markers in HTML
+    soup, conversions = normalize_chapter_markers(soup)
+
+    return html_to_markdown(soup), conversions
 
 
 def epub_to_clean_markdown(epub_path):
@@ -316,25 +407,17 @@ def epub_to_clean_markdown(epub_path):
     markdown_parts.append(f"**Author:** {book_author}\n\n")
     markdown_parts.append("---\n\n")
 
-    document_count = 0
-    for item in book.get_items():
-        if item.get_type() == ebooklib.ITEM_DOCUMENT:
-            document_count += 1
-            content = item.get_content()
-            soup = BeautifulSoup(content, 'html.parser')
-
-            for script in soup(["script", "style"]):
-                script.decompose()
-
-            # Layer 1: Normalize chapter markers in HTML
-            soup = normalize_chapter_markers(soup)
-
-            markdown_text = html_to_markdown(soup)
+    documents = [item.get_content() for item in book.get_items()
+                 if item.get_type() == ebooklib.ITEM_DOCUMENT]
 
+    # Documents are independent, so convert them on all cores (map keeps order)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for markdown_text, conversions in executor.map(document_to_markdown, documents, chunksize=4):
+            print_chapter_conversions(conversions)
             if markdown_text.strip():
                 markdown_parts.append(markdown_text)
 
-    print(f"Processed {document_count} document sections")
+    print(f"Processed {len(documents)} document sections")
 
     final_markdown = ''.join(markdown_parts)
 
@@ -346,15 +429,95 @@ def epub_to_clean_markdown(epub_path):
     return final_markdown, book_title, book_author
 
 
-def generate_tags_with_ollama(text, book_title, chapter_title, model="qwen2.5:7b"):
-    """Generate semantic tags for a text chunk using Ollama."""
+def warm_ollama(model="qwen2.5:7b"):
+    """Load the model into Ollama with a one-token request so the first chunk doesn't pay the cold start."""
+    try:
+        response = OLLAMA_SESSION.post(
+            'http://localhost:11434/api/generate',
+            json={
+                'model': model,
+                'prompt': 'hi',
+                'stream': False,
+                'keep_alive': '30m',
+                'options': {'num_predict': 1}
+            },
+            timeout=120
+        )
+    except requests.exceptions.ConnectionError:
+        raise RuntimeError("Cannot connect to Ollama (is it running?)")
+    if response.status_code != 200:
+        raise RuntimeError(f"Ollama returned status {response.status_code} while loading {model}")
+
+
+# On-disk cache of Ollama tags, so reprocessing a book skips chunks already tagged.
+# Lives in the library directory; main() points it at the active --index-dir.
+TAG_CACHE_NAME = "tag_cache.sqlite"
+tag_cache_path = Path(__file__).parent / "private" / TAG_CACHE_NAME
+tag_cache_connection = None
+tag_cache_lock = threading.Lock()
+
+
+def tag_cache_key(text, book_title, chapter_title, model):
+    """Hash everything that goes into the tag prompt."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model, book_title, chapter_title, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_tag_cache():
+    """Open (once) the SQLite tag cache, creating it if needed."""
+    global tag_cache_connection
+    if tag_cache_connection is None:
+        tag_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tag_cache_connection = sqlite3.connect(tag_cache_path, check_same_thread=False)
+        tag_cache_connection.execute("PRAGMA journal_mode=WAL")
+        tag_cache_connection.execute(
+            "CREATE TABLE IF NOT EXISTS tag_cache (key TEXT PRIMARY KEY, tags TEXT NOT NULL)"
+        )
+    return tag_cache_connection
+
+
+def lookup_cached_tags(key):
+    """Return cached tags for key, or None on a miss."""
+    with tag_cache_lock:
+        row = get_tag_cache().execute("SELECT tags FROM tag_cache WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def store_cached_tags(key, tags):
+    """Save generated tags under key."""
+    with tag_cache_lock:
+        connection = get_tag_cache()
+        connection.execute("INSERT OR REPLACE INTO tag_cache (key, tags) VALUES (?, ?)", (key, tags))
+        connection.commit()
+
+
+def generate_tags_with_ollama(text, book_title, chapter_title, model="qwen2.5:7b", word_count=None,
+                              use_cache=True):
+    """
+    Generate semantic tags for a text chunk using Ollama (cached by content hash).
+
+    Pass word_count if already known so short chunks skip splitting the text.
+    Pass use_cache=False if the caller has already checked the cache.
+    """
+    cache_key = tag_cache_key(text, book_title, chapter_title, model)
+    if use_cache:
+        cached = lookup_cached_tags(cache_key)
+        if cached is not None:
+            return cached
+
     # Extract key sentences from beginning, middle, and end for better theme understanding
-    words = text.split()
-    if len(words) > 600:
-        # Take first 200, middle 200, last 200 words for better coverage
-        sample = ' '.join(words[:200]) + ' [...] ' + ' '.join(words[len(words)//2-100:len(words)//2+100]) + ' [...] ' + ' '.join(words[-200:])
-    else:
+    if word_count is not None and word_count <= 600:
         sample = text
+    else:
+        words = text.split()
+        if len(words) > 600:
+            # Take first 200, middle 200, last 200 words for better coverage
+            sample = ' '.join(words[:200]) + ' [...] ' + ' '.join(words[len(words)//2-100:len(words)//2+100]) + ' [...] ' + ' '.join(words[-200:])
+        else:
+            sample = text
 
     prompt = f"""Read this passage from "{book_title}" and identify what it's REALLY about.
 
@@ -376,18 +539,19 @@ Output format: comma-separated lowercase tags ONLY, no explanation
 Example: jealousy, comparison, inferiority, envy, insecurity, rivalry"""
 
     try:
-        response = requests.post(
+        response = OLLAMA_SESSION.post(
             'http://localhost:11434/api/generate',
             json={
                 'model': model,
                 'prompt': prompt,
                 'stream': False,
+                'keep_alive': '30m',  # Keep the model loaded between chunks
                 'options': {
                     'temperature': 0.3,  # Lower temperature for more focused tags
                     'num_predict': 50    # Limit output length
                 }
             },
-            timeout=30
+            timeout=OLLAMA_TAG_TIMEOUT
         )
 
         if response.status_code == 200:
@@ -401,7 +565,9 @@ Example: jealousy, comparison, inferiority, envy, insecurity, rivalry"""
             # Clean up extra whitespace and limit to 5 tags maximum
             tags_list = [tag.strip() for tag in tags_text.split(',') if tag.strip()]
             tags_list = tags_list[:5]  # Hard limit to 5 tags
-            return ', '.join(tags_list)
+            tags = ', '.join(tags_list)
+            store_cached_tags(cache_key, tags)
+            return tags
         else:
             raise RuntimeError(f"Ollama returned status {response.status_code}")
     except requests.exceptions.ConnectionError:
@@ -412,36 +578,48 @@ Example: jealousy, comparison, inferiority, envy, insecurity, rivalry"""
         raise RuntimeError(f"Error generating tags: {e}")
 
 
-def is_table_of_contents(chapter_title, content, word_count):
+@lru_cache(maxsize=1024)
+def classify_title(chapter_title):
+    """
+    Classify a chapter title as 'toc', 'bibliography' or '' (neither).
+
+    Memoized: the same titles recur across a book's chunks, and the TOC and
+    bibliography filters both need this verdict for every chunk.
+    """
+    title_lower = chapter_title.lower().strip()
+    if TOC_TITLE_RE.match(title_lower):
+        return 'toc'
+    if BIBLIOGRAPHY_TITLE_RE.match(title_lower):
+        return 'bibliography'
+    return ''
+
+
+def is_table_of_contents(chapter_title, lines, word_count):
     """
     Detect if chunk is a Table of Contents.
 
     Primary signal: Chapter title contains "contents"
     Secondary validation: High ratio of list items or TOC section keywords
 
+    `lines` are the chunk's stripped, non-empty, non-header lines.
+
     Returns:
         tuple: (is_toc: bool, reason: str)
     """
-    title_lower = chapter_title.lower().strip()
-
     # Primary signal: Title match
-    title_is_toc = any(re.match(pattern, title_lower) for pattern in TOC_TITLE_PATTERNS)
-
-    if not title_is_toc:
+    if classify_title(chapter_title) != 'toc':
         return False, ""
 
     # Secondary validation: Content analysis
-    lines = [l.strip() for l in content.split('\n') if l.strip() and not l.strip().startswith('#')]
-
     if len(lines) == 0:
         return True, "empty TOC"
 
     # Count list items (numbered or Roman numerals)
-    list_lines = sum(1 for l in lines if re.match(r'^\d+\.', l) or re.match(r'^[IVX]+\.', l))
+    list_lines = sum(1 for l in lines if TOC_LIST_LINE_RE.match(l))
 
     # Count TOC section keywords
-    toc_keyword_lines = sum(1 for l in lines
-                           if any(keyword in l.lower() for keyword in TOC_SECTION_KEYWORDS))
+    toc_keyword_lines = sum(1 for l in map(str.lower, lines)
+                            if any(keyword in l for keyword in TOC_SECTION_KEYWORDS))
 
     list_ratio = list_lines / len(lines) if lines else 0
     keyword_ratio = toc_keyword_lines / len(lines) if lines else 0
@@ -463,27 +641,28 @@ def is_table_of_contents(chapter_title, content, word_count):
     return False, ""
 
 
-def is_bibliography(chapter_title, content, word_count):
+def has_at_least(pattern, text, n):
+    """True if pattern matches text at least n times; stops scanning at the nth match."""
+    return sum(1 for _ in islice(pattern.finditer(text), n)) == n
+
+
+def is_bibliography(chapter_title, content, lines, word_count):
     """
     Detect if chunk is a Bibliography/References section.
 
     Primary signal: Chapter title is "Bibliography", "References", etc.
     Secondary validation: High density of academic citation patterns
 
+    `lines` are the chunk's stripped, non-empty, non-header lines.
+
     Returns:
         tuple: (is_bib: bool, reason: str)
     """
-    title_lower = chapter_title.lower().strip()
-
     # Primary signal: Title match
-    title_is_bib = any(re.match(pattern, title_lower) for pattern in BIBLIOGRAPHY_TITLE_PATTERNS)
-
-    if not title_is_bib:
+    if classify_title(chapter_title) != 'bibliography':
         return False, ""
 
     # Secondary validation: Citation pattern density
-    lines = [l.strip() for l in content.split('\n') if l.strip() and not l.strip().startswith('#')]
-
     if len(lines) == 0:
         return True, "empty bibliography"
 
@@ -491,16 +670,16 @@ def is_bibliography(chapter_title, content, word_count):
     citation_lines = 0
     for line in lines:
         # A line is a citation if it matches multiple citation patterns
-        pattern_matches = sum(1 for pattern in BIBLIOGRAPHY_CITATION_PATTERNS
-                             if re.search(pattern, line))
+        pattern_matches = sum(1 for pattern in BIBLIOGRAPHY_CITATION_RES
+                             if pattern.search(line))
         if pattern_matches >= 2:  # At least 2 citation indicators
             citation_lines += 1
 
     citation_density = citation_lines / len(lines) if lines else 0
 
     # Additional signals for bibliographies
-    has_author_names = bool(re.findall(r'\b[A-Z][a-z]+,\s*[A-Z]', content))  # "Smith, J."
-    has_multiple_years = len(re.findall(r'\([12]\d{3}\)', content)) >= 3
+    has_author_names = AUTHOR_NAME_RE.search(content) is not None  # "Smith, J."
+    has_multiple_years = has_at_least(CITATION_YEAR_RE, content, 3)
 
     is_bib = (
         citation_density >= CHUNK_FILTER_CONFIG['bibliography_min_citation_density'] or
@@ -514,6 +693,40 @@ def is_bibliography(chapter_title, content, word_count):
     return False, ""
 
 
+# Metadata/junk keywords to filter out
+JUNK_PATTERNS = [
+    'contents',
+    'table of contents',
+    'copyright',
+    'published in',
+    'isbn',
+    'all rights reserved',
+    'cover',
+    'title page',
+    'dedication',
+    'acknowledgments',
+    'acknowledgements',
+    'about the author',
+    'also by',
+    'other books',
+    'guide',
+    'designed and typeset',
+    'first published',
+    'ISBN',
+    'illustration list',
+    'image credits',
+    'series editor',
+    'dedicated to exploring',
+    'dedicated to helping',
+    'visit us at',
+    'follow us on',
+    'announces a rebirth',
+    'series that examines'
+]
+
+PHOTO_CREDIT_PATTERNS = ['photo ©', 'oil on canvas', 'cm.', 'bridgeman images', 'tate, london', 'metropolitan museum']
+
+
 def chunk_markdown_hierarchically(markdown_content, book_title):
     """Split markdown into hierarchical chunks using LlamaIndex."""
     from llama_index.core import Document
@@ -525,140 +738,156 @@ def chunk_markdown_hierarchically(markdown_content, book_title):
     parser = MarkdownNodeParser()
     nodes = parser.get_nodes_from_documents([document])
 
-    # Metadata/junk keywords to filter out
-    junk_patterns = [
-        'contents',
-        'table of contents',
-        'copyright',
-        'published in',
-        'isbn',
-        'all rights reserved',
-        'cover',
-        'title page',
-        'dedication',
-        'acknowledgments',
-        'acknowledgements',
-        'about the author',
-        'also by',
-        'other books',
-        'guide',
-        'designed and typeset',
-        'first published',
-        'ISBN',
-        'illustration list',
-        'image credits',
-        'series editor',
-        'dedicated to exploring',
-        'dedicated to helping',
-        'visit us at',
-        'follow us on',
-        'announces a rebirth',
-        'series that examines'
-    ]
 
-    chunks = []
+    passed = []  # (content, chapter_title, word_count, node_metadata) awaiting tags
     filtered_count = 0
     filter_reasons = {}  # Track why chunks were filtered (for diagnostics)
 
     print("Generating semantic tags for chunks (this may take a few minutes)...")
 
-    for i, node in enumerate(nodes):
-        content = node.get_content()
-        content_lower = content.lower()
-        word_count = len(content.split())
-        lines = [l.strip() for l in content.split('\n') if l.strip()]
-
-        # === EXTRACT CHAPTER TITLE FIRST (needed for title-based filtering) ===
-        chapter_title = "Unknown Chapter"
-        for line in content.split('\n'):
-            line = line.strip()
-            if line.startswith('#'):
-                chapter_title = line.lstrip('#').strip()
-                break
-
-        # === FILTER 1: MINIMUM LENGTH ===
-        if word_count < 30:
-            filtered_count += 1
-            filter_reasons['too_short'] = filter_reasons.get('too_short', 0) + 1
-            continue
-
-        # === FILTER 2: TABLE OF CONTENTS (new dedicated filter) ===
-        if CHUNK_FILTER_CONFIG['enable_toc_filter']:
-            is_toc, toc_reason = is_table_of_contents(chapter_title, content, word_count)
-            if is_toc:
+    # Tagging is pipelined with filtering: each chunk is sent to Ollama as soon
+    # as it passes, so filtering the rest overlaps with generation. Ollama
+    # serves OLLAMA_NUM_PARALLEL requests at once.
+    # The model is loaded by the first cache miss only, so a fully cached
+    # book never waits on (or needs) Ollama
+    warm_lock = threading.Lock()
+    warm_future = None
+
+    def ensure_model_loaded():
+        nonlocal warm_future
+        with warm_lock:
+            first = warm_future is None
+            if first:
+                warm_future = Future()
+        if first:
+            try:
+                warm_ollama()
+                warm_future.set_result(None)
+            except Exception as e:
+                warm_future.set_exception(e)
+        warm_future.result()  # Re-raises if loading failed
+
+    def tag_chunk(chunk_id, content, chapter_title, word_count):
+        cached = lookup_cached_tags(tag_cache_key(content, book_title, chapter_title, "qwen2.5:7b"))
+        if cached is not None:
+            return cached
+        ensure_model_loaded()
+        print(f"  Chunk {chunk_id + 1}: {chapter_title[:50]}...")
+        return generate_tags_with_ollama(content, book_title, chapter_title, word_count=word_count,
+                                         use_cache=False)
+
+    tag_futures = []
+    with ThreadPoolExecutor(max_workers=OLLAMA_NUM_PARALLEL) as executor:
+        # Filters run cheapest first: length, then title-gated TOC/bibliography
+        # checks, and only then the lowercased full-text keyword scans
+        for node in nodes:
+            content = node.get_content()
+            word_count = len(content.split())
+
+            # === FILTER 1: MINIMUM LENGTH ===
+            if word_count < 30:
                 filtered_count += 1
-                filter_reasons['table_of_contents'] = filter_reasons.get('table_of_contents', 0) + 1
-                if CHUNK_FILTER_CONFIG['enable_diagnostic_output']:
-                    print(f"  [FILTERED TOC] {chapter_title[:40]} - {toc_reason}")
+                filter_reasons['too_short'] = filter_reasons.get('too_short', 0) + 1
                 continue
 
-        # === FILTER 3: BIBLIOGRAPHY/REFERENCES (new dedicated filter) ===
-        if CHUNK_FILTER_CONFIG['enable_bibliography_filter']:
-            is_bib, bib_reason = is_bibliography(chapter_title, content, word_count)
-            if is_bib:
+            # Split and strip lines once; the title and both filters share them
+            lines = [stripped for line in content.split('\n') if (stripped := line.strip())]
+            body_lines = [line for line in lines if not line.startswith('#')]
+
+            # === EXTRACT CHAPTER TITLE (needed for title-based filtering) ===
+            chapter_title = next(
+                (line.lstrip('#').strip() for line in lines if line.startswith('#')),
+                "Unknown Chapter"
+            )
+
+            # === FILTER 2: TABLE OF CONTENTS (new dedicated filter) ===
+            if CHUNK_FILTER_CONFIG['enable_toc_filter']:
+                is_toc, toc_reason = is_table_of_contents(chapter_title, body_lines, word_count)
+                if is_toc:
+                    filtered_count += 1
+                    filter_reasons['table_of_contents'] = filter_reasons.get('table_of_contents', 0) + 1
+                    if CHUNK_FILTER_CONFIG['enable_diagnostic_output']:
+                        print(f"  [FILTERED TOC] {chapter_title[:40]} - {toc_reason}")
+                    continue
+
+            # === FILTER 3: BIBLIOGRAPHY/REFERENCES (new dedicated filter) ===
+            if CHUNK_FILTER_CONFIG['enable_bibliography_filter']:
+                is_bib, bib_reason = is_bibliography(chapter_title, content, body_lines, word_count)
+                if is_bib:
+                    filtered_count += 1
+                    filter_reasons['bibliography'] = filter_reasons.get('bibliography', 0) + 1
+                    if CHUNK_FILTER_CONFIG['enable_diagnostic_output']:
+                        print(f"  [FILTERED BIBLIOGRAPHY] {chapter_title[:40]} - {bib_reason}")
+                    continue
+
+            content_lower = content.lower()
+
+            # === FILTER 4: COPYRIGHT/PUBLICATION METADATA ===
+            has_copyright = 'copyright' in content_lower or '©' in content
+            has_isbn = 'isbn' in content_lower
+            has_published = 'published in' in content_lower or 'first published' in content_lower
+
+            if (has_copyright and has_isbn) or (has_copyright and has_published and word_count < 300):
                 filtered_count += 1
-                filter_reasons['bibliography'] = filter_reasons.get('bibliography', 0) + 1
-                if CHUNK_FILTER_CONFIG['enable_diagnostic_output']:
-                    print(f"  [FILTERED BIBLIOGRAPHY] {chapter_title[:40]} - {bib_reason}")
+                filter_reasons['copyright_metadata'] = filter_reasons.get('copyright_metadata', 0) + 1
                 continue
 
-        # === FILTER 4: COPYRIGHT/PUBLICATION METADATA ===
-        has_copyright = 'copyright' in content_lower or '©' in content
-        has_isbn = 'isbn' in content_lower
-        has_published = 'published in' in content_lower or 'first published' in content_lower
-
-        if (has_copyright and has_isbn) or (has_copyright and has_published and word_count < 300):
-            filtered_count += 1
-            filter_reasons['copyright_metadata'] = filter_reasons.get('copyright_metadata', 0) + 1
-            continue
+            # Skip chunks with standalone ISBN numbers (publication metadata)
+            if ISBN_RE.search(content_lower) and word_count < 200:
+                filtered_count += 1
+                filter_reasons['isbn_metadata'] = filter_reasons.get('isbn_metadata', 0) + 1
+                continue
 
-        # Skip chunks with standalone ISBN numbers (publication metadata)
-        if re.search(r'isbn:\s*978-[\d-]+', content_lower) and word_count < 200:
-            filtered_count += 1
-            filter_reasons['isbn_metadata'] = filter_reasons.get('isbn_metadata', 0) + 1
-            continue
+            # === FILTER 5: FRONT/BACK MATTER (dedications, acknowledgments, etc) ===
+            # Skip if contains multiple junk keywords
+            junk_word_count = sum(1 for pattern in JUNK_PATTERNS if pattern in content_lower)
+            if junk_word_count >= 3:
+                filtered_count += 1
+                filter_reasons['multiple_junk_keywords'] = filter_reasons.get('multiple_junk_keywords', 0) + 1
+                continue
 
-        # === FILTER 5: FRONT/BACK MATTER (dedications, acknowledgments, etc) ===
-        # Skip if contains multiple junk keywords
-        junk_word_count = sum(1 for pattern in junk_patterns if pattern in content_lower)
-        if junk_word_count >= 3:
-            filtered_count += 1
-            filter_reasons['multiple_junk_keywords'] = filter_reasons.get('multiple_junk_keywords', 0) + 1
-            continue
+            # Skip "Guide" sections that are just lists
+            if 'guide' in content_lower and word_count < 100:
+                filtered_count += 1
+                filter_reasons['guide_section'] = filter_reasons.get('guide_section', 0) + 1
+                continue
 
-        # Skip "Guide" sections that are just lists
-        if 'guide' in content_lower and word_count < 100:
-            filtered_count += 1
-            filter_reasons['guide_section'] = filter_reasons.get('guide_section', 0) + 1
-            continue
+            # === FILTER 6: ILLUSTRATION LISTS AND IMAGE CREDITS ===
+            if 'illustration list' in content_lower or 'also available from' in content_lower:
+                filtered_count += 1
+                filter_reasons['illustration_list'] = filter_reasons.get('illustration_list', 0) + 1
+                continue
 
-        # === FILTER 6: ILLUSTRATION LISTS AND IMAGE CREDITS ===
-        if 'illustration list' in content_lower or 'also available from' in content_lower:
-            filtered_count += 1
-            filter_reasons['illustration_list'] = filter_reasons.get('illustration_list', 0) + 1
-            continue
+            # Skip if it's mostly a list of images/photos (photo credits)
+            photo_matches = sum(1 for pattern in PHOTO_CREDIT_PATTERNS if pattern in content_lower)
+            if photo_matches >= 3 and word_count < 300:
+                filtered_count += 1
+                filter_reasons['image_credits'] = filter_reasons.get('image_credits', 0) + 1
+                continue
 
-        # Skip if it's mostly a list of images/photos (photo credits)
-        photo_credit_patterns = ['photo ©', 'oil on canvas', 'cm.', 'bridgeman images', 'tate, london', 'metropolitan museum']
-        photo_matches = sum(1 for pattern in photo_credit_patterns if pattern in content_lower)
-        if photo_matches >= 3 and word_count < 300:
-            filtered_count += 1
-            filter_reasons['image_credits'] = filter_reasons.get('image_credits', 0) + 1
-            continue
+            # === FILTER 7: PUBLISHER BRANDING/PROMOTIONAL CONTENT ===
+            # Skip publisher branding/promotional content (contains URLs/website domains)
+            url_patterns = URL_RE.findall(content_lower)
+            if url_patterns and word_count < 250:
+                # Short chunks with URLs are likely promotional/branding
+                filtered_count += 1
+                filter_reasons['publisher_branding'] = filter_reasons.get('publisher_branding', 0) + 1
+                continue
 
-        # === FILTER 7: PUBLISHER BRANDING/PROMOTIONAL CONTENT ===
-        # Skip publisher branding/promotional content (contains URLs/website domains)
-        url_patterns = re.findall(r'(?:[a-zA-Z0-9-]+\.)+(?:com|org|net|edu|gov|io|co\.uk)', content_lower)
-        if url_patterns and word_count < 250:
-            # Short chunks with URLs are likely promotional/branding
-            filtered_count += 1
-            filter_reasons['publisher_branding'] = filter_reasons.get('publisher_branding', 0) + 1
-            continue
+            # === CHUNK PASSED ALL FILTERS - QUEUE FOR TAGGING ===
+            passed.append((content, chapter_title, word_count, node.metadata))
+            tag_futures.append(executor.submit(tag_chunk, len(passed) - 1, content, chapter_title, word_count))
 
-        # === CHUNK PASSED ALL FILTERS - GENERATE TAGS AND SAVE ===
-        print(f"  Chunk {len(chunks) + 1}: {chapter_title[:50]}...")
-        tags = generate_tags_with_ollama(content, book_title, chapter_title)
+        try:
+            wait(tag_futures, return_when=FIRST_EXCEPTION)
+            all_tags = [future.result() for future in tag_futures]
+        except BaseException:
+            # Stop at the first failed request instead of running the rest of the queue
+            executor.shutdown(cancel_futures=True)
+            raise
 
+    chunks = []
+    for (content, chapter_title, word_count, node_metadata), tags in zip(passed, all_tags):
         chunk_data = {
             "chunk_id": len(chunks),  # Reindex after filtering
             "content": content,
@@ -669,7 +898,7 @@ def chunk_markdown_hierarchically(markdown_content, book_title):
                 "word_count": word_count,
                 "chapter_title": chapter_title,
                 "tags": tags,
-                **node.metadata
+                **node_metadata
             }
         }
         chunks.append(chunk_data)
@@ -685,32 +914,25 @@ def chunk_markdown_hierarchically(markdown_content, book_title):
     return chunks
 
 
-def save_chunks(chunks, output_dir, book_title, start_doc_id=0):
-    """Save chunks to both JSON and individual markdown files with global doc_ids."""
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+SAFE_TITLE_STRIP_RE = re.compile(r'[^\w\s-]')
+SAFE_TITLE_SEPARATOR_RE = re.compile(r'[-\s]+')
 
-    safe_title = re.sub(r'[^\w\s-]', '', book_title)
-    safe_title = re.sub(r'[-\s]+', '_', safe_title)
 
-    chunks_dir = output_path / safe_title
-    chunks_dir.mkdir(exist_ok=True)
+def make_safe_title(book_title):
+    """Directory/ID form of a book title: punctuation dropped, spaces and dashes to '_'."""
+    return SAFE_TITLE_SEPARATOR_RE.sub('_', SAFE_TITLE_STRIP_RE.sub('', book_title))
 
-    # Add global doc_id to each chunk
-    for i, chunk in enumerate(chunks):
-        chunk['doc_id'] = start_doc_id + i
 
-    json_path = chunks_dir / "chunks.json"
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(chunks, f, indent=2, ensure_ascii=False)
+# Threads for writing chunk_NNN.md files; file writes release the GIL
+CHUNK_FILE_WRITERS = 8
 
-    print(f"\n✓ Chunks saved to JSON: {json_path}")
 
-    for chunk in chunks:
-        chunk_filename = f"chunk_{chunk['chunk_id']:03d}.md"
-        chunk_path = chunks_dir / chunk_filename
+def write_chunk_file(chunks_dir, chunk):
+    """Write one chunk as a markdown file with YAML front matter."""
+    # Plain-string path: no Path object built per chunk file
+    chunk_path = os.path.join(chunks_dir, f"chunk_{chunk['chunk_id']:03d}.md")
 
-        chunk_content = f"""---
+    chunk_content = f"""---
 chunk_id: {chunk['chunk_id']}
 doc_id: {chunk['doc_id']}
 chapter_title: {chunk['chapter_title']}
@@ -721,18 +943,50 @@ word_count: {chunk['metadata']['word_count']}
 
 {chunk['content']}
 """
-        chunk_path.write_text(chunk_content, encoding='utf-8')
+    with open(chunk_path, 'w', encoding='utf-8') as f:
+        f.write(chunk_content)
+
+
+def save_chunks(chunks, output_dir, book_title, start_doc_id=0):
+    """Save chunks to both JSON and individual markdown files with global doc_ids."""
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    safe_title = make_safe_title(book_title)
+
+    chunks_dir = output_path / safe_title
+    chunks_dir.mkdir(exist_ok=True)
+
+    # Add global doc_id to each chunk, building each dict in one pass
+    doc_ids = range(start_doc_id, start_doc_id + len(chunks))
+    chunks = [{**chunk, 'doc_id': doc_id} for chunk, doc_id in zip(chunks, doc_ids)]
+
+    json_path = chunks_dir / "chunks.json"
+    dump_json(chunks, json_path, indent=False)
+
+    print(f"\n✓ Chunks saved to JSON: {json_path}")
+
+    # Overlap the per-file open/write/close syscalls
+    chunks_dir_str = os.fspath(chunks_dir)
+    with ThreadPoolExecutor(max_workers=CHUNK_FILE_WRITERS) as executor:
+        # list() re-raises the first failed write
+        list(executor.map(write_chunk_file, repeat(chunks_dir_str), chunks))
 
     print(f"✓ Individual chunk files saved to: {chunks_dir}")
     print(f"  Total chunks: {len(chunks)}")
 
-    total_words = sum(c['metadata']['word_count'] for c in chunks)
-    avg_words = total_words // len(chunks) if chunks else 0
+    # Pull word counts out once instead of re-walking the chunk dicts per statistic
+    word_counts = [c['metadata']['word_count'] for c in chunks]
+    if not word_counts:
+        return
+
+    total_words = sum(word_counts)
+    avg_words = total_words // len(word_counts)
     print(f"\nChunk Statistics:")
     print(f"  Total words: {total_words:,}")
     print(f"  Average words per chunk: {avg_words:,}")
-    print(f"  Smallest chunk: {min(c['metadata']['word_count'] for c in chunks):,} words")
-    print(f"  Largest chunk: {max(c['metadata']['word_count'] for c in chunks):,} words")
+    print(f"  Smallest chunk: {min(word_counts):,} words")
+    print(f"  Largest chunk: {max(word_counts):,} words")
 
 
 def update_books_metadata(chunks, book_title, author, index_dir, chunk_dir, auto_replace=False):
@@ -741,14 +995,12 @@ def update_books_metadata(chunks, book_title, author, index_dir, chunk_dir, auto
 
     # Load or create metadata
     if metadata_path.exists():
-        with open(metadata_path, 'r') as f:
-            books_metadata = json.load(f)
+        books_metadata = load_json(metadata_path)
     else:
         books_metadata = {"books": [], "next_id": 0}
 
     # Check if book already exists
-    safe_title = re.sub(r'[^\w\s-]', '', book_title)
-    safe_title = re.sub(r'[-\s]+', '_', safe_title)
+    safe_title = make_safe_title(book_title)
 
     existing_book = next((b for b in books_metadata["books"] if b["safe_title"] == safe_title), None)
 
@@ -785,8 +1037,7 @@ def update_books_metadata(chunks, book_title, author, index_dir, chunk_dir, auto
     # Ensure directory exists
     metadata_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(metadata_path, 'w') as f:
-        json.dump(books_metadata, f, indent=2)
+    dump_json(books_metadata, metadata_path)
 
     print(f"✓ Metadata updated: {metadata_path}")
     print(f"✓ Total books: {len(books_metadata['books'])}")
@@ -802,8 +1053,7 @@ def list_books(index_dir):
         print(f"Library location: {index_dir}")
         return
 
-    with open(metadata_path) as f:
-        books_metadata = json.load(f)
+    books_metadata = load_json(metadata_path)
 
     books = books_metadata.get("books", [])
 
@@ -812,9 +1062,12 @@ def list_books(index_dir):
         print(f"Library location: {index_dir}")
         return
 
-    print(f"\n{'='*80}")
-    print(f"Books in Library: {index_dir}")
-    print(f"{'='*80}\n")
+    # Build the listing and write it once rather than a print() per line
+    lines = [
+        f"\n{'='*80}",
+        f"Books in Library: {index_dir}",
+        f"{'='*80}\n",
+    ]
 
     for i, book in enumerate(books, 1):
         title = book.get("title", "Unknown")
@@ -825,21 +1078,38 @@ def list_books(index_dir):
 
         # Format date
         try:
-            from datetime import datetime
             dt = datetime.fromisoformat(added_date)
             date_str = dt.strftime("%Y-%m-%d")
         except:
             date_str = added_date
 
-        print(f"{i}. {title}")
-        print(f"   Author: {author}")
-        print(f"   Chunks: {chunk_count} | Added: {date_str}")
-        print(f"   ID: {safe_title}")
-        print()
+        lines.append(f"{i}. {title}")
+        lines.append(f"   Author: {author}")
+        lines.append(f"   Chunks: {chunk_count} | Added: {date_str}")
+        lines.append(f"   ID: {safe_title}")
+        lines.append("")
+
+    lines.append(f"{'='*80}")
+    lines.append(f"Total: {len(books)} book(s)")
+    lines.append(f"{'='*80}\n")
 
-    print(f"{'='*80}")
-    print(f"Total: {len(books)} book(s)")
-    print(f"{'='*80}\n")
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def remove_path(entry):
+    """Remove a directory entry, recursing into subdirectories."""
+    if entry.is_dir(follow_symlinks=False):
+        remove_book_dir(entry.path)
+    else:
+        os.unlink(entry.path)
+
+
+def remove_book_dir(book_dir):
+    """Delete a book directory, unlinking its chunk files in parallel."""
+    with os.scandir(book_dir) as entries, ThreadPoolExecutor(max_workers=16) as executor:
+        # list() re-raises the first failed removal
+        list(executor.map(remove_path, entries))
+    os.rmdir(book_dir)
 
 
 def delete_book(book_identifier, index_dir, force=False):
@@ -858,22 +1128,17 @@ def delete_book(book_identifier, index_dir, force=False):
         print("Error: No library found at this location.")
         return
 
-    with open(metadata_path) as f:
-        books_metadata = json.load(f)
+    books_metadata = load_json(metadata_path)
 
     books = books_metadata.get("books", [])
 
-    # Find matching books
-    matches = []
+    # Find matching books (an exact safe_title is also a substring match)
     identifier_lower = book_identifier.lower()
-
-    for book in books:
-        title_match = identifier_lower in book.get("title", "").lower()
-        safe_title_match = identifier_lower in book.get("safe_title", "").lower()
-        exact_safe_title = identifier_lower == book.get("safe_title", "").lower()
-
-        if title_match or safe_title_match or exact_safe_title:
-            matches.append(book)
+    matches = [
+        book for book in books
+        if identifier_lower in book.get("title", "").lower()
+        or identifier_lower in book.get("safe_title", "").lower()
+    ]
 
     if not matches:
         print(f"Error: No books found matching '{book_identifier}'")
@@ -917,8 +1182,7 @@ def delete_book(book_identifier, index_dir, force=False):
     # Remove book directory
     book_dir = index_dir / "books" / safe_title
     if book_dir.exists():
-        import shutil
-        shutil.rmtree(book_dir)
+        remove_book_dir(book_dir)
         print(f"  ✓ Removed book directory")
     else:
         print(f"  ⚠️  Book directory not found (may have been manually deleted)")
@@ -926,8 +1190,7 @@ def delete_book(book_identifier, index_dir, force=False):
     # Remove from metadata
     books_metadata["books"] = [b for b in books_metadata["books"] if b["safe_title"] != safe_title]
 
-    with open(metadata_path, 'w') as f:
-        json.dump(books_metadata, f, indent=2)
+    dump_json(books_metadata, metadata_path)
     print(f"  ✓ Updated metadata")
 
     # Completion message
@@ -940,6 +1203,8 @@ def delete_book(book_identifier, index_dir, force=False):
 
 def main():
     """Index an EPUB file into the unified library."""
+    global tag_cache_path
+
     parser = argparse.ArgumentParser(
         description='Manage your book library - index, list, and delete books',
         epilog='Examples:\n'
@@ -964,6 +1229,7 @@ def main():
     args = parser.parse_args()
 
     index_dir = Path(args.index_dir).expanduser()
+    tag_cache_path = index_dir / TAG_CACHE_NAME
 
     # Check Ollama availability (only for add operations, not --list or --delete)
     if not args.list and not args.delete:
@@ -1011,29 +1277,25 @@ def main():
         print(f"Error: File must be an EPUB file")
         sys.exit(1)
 
-    # Convert and chunk
+    # Convert (cheap) before chunking, which makes one Ollama call per chunk
     markdown_content, book_title, author = epub_to_clean_markdown(epub_path)
-    chunks = chunk_markdown_hierarchically(markdown_content, book_title)
 
-    # Save markdown and chunks
-    safe_title = re.sub(r'[^\w\s-]', '', book_title)
-    safe_title = re.sub(r'[-\s]+', '_', safe_title)
+    safe_title = make_safe_title(book_title)
 
-    chunk_dir = index_dir / "books" / safe_title
-    output_md = chunk_dir / f"{safe_title}.md"
-    output_md.parent.mkdir(parents=True, exist_ok=True)
-    output_md.write_text(markdown_content, encoding='utf-8')
-
-    print(f"\n✓ Markdown saved to: {output_md}")
-
-    # Get starting doc_id from metadata
+    # Get starting doc_id from metadata, and confirm any replacement now,
+    # before tag generation and before anything is written to disk
     metadata_path = index_dir / "books_metadata.json"
     if metadata_path.exists():
-        with open(metadata_path, 'r') as f:
-            books_metadata = json.load(f)
+        books_metadata = load_json(metadata_path)
         # Check if book already exists (for replacement)
         existing_book = next((b for b in books_metadata["books"] if b["safe_title"] == safe_title), None)
         if existing_book:
+            if not args.replace:
+                print(f"\n⚠️  Book '{book_title}' already in metadata!")
+                response = input("Replace it? (y/N): ").strip().lower()
+                if response != 'y':
+                    print("Skipping...")
+                    return
             # Book is being replaced, reuse its ID range
             start_doc_id = existing_book["id_range"][0]
         else:
@@ -1043,10 +1305,20 @@ def main():
         # No metadata yet, start from 0
         start_doc_id = 0
 
+    chunks = chunk_markdown_hierarchically(markdown_content, book_title)
+
+    # Save markdown and chunks
+    chunk_dir = index_dir / "books" / safe_title
+    output_md = chunk_dir / f"{safe_title}.md"
+    output_md.parent.mkdir(parents=True, exist_ok=True)
+    output_md.write_text(markdown_content, encoding='utf-8')
+
+    print(f"\n✓ Markdown saved to: {output_md}")
+
     save_chunks(chunks, index_dir / "books", book_title, start_doc_id)
 
-    # Update metadata
-    update_books_metadata(chunks, book_title, author, index_dir, chunk_dir, args.replace)
+    # Update metadata (replacement was already confirmed above)
+    update_books_metadata(chunks, book_title, author, index_dir, chunk_dir, auto_replace=True)
 
     print(f"\n✓ Book processing complete!")
     print(f"  Run './lib --sync' to generate embeddings and sync to web.")
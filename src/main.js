@@ -133,7 +133,7 @@ async function initialize() {
           if (!data.results.length) {
             const message = document.createElement("div");
             message.setAttribute("class", "no_result");
-            message.innerHTML = `<span>No tags found for "${data.query}"</span>`;
+            message.innerHTML = `<span>No tags found for "${escapeHtml(data.query)}"</span>`;
             list.appendChild(message);
           }
         }
@@ -141,7 +141,7 @@ async function initialize() {
       resultItem: {
         highlight: true,
         element: (item, data) => {
-          item.innerHTML = `tag:${data.value}`;
+          item.innerHTML = `tag:${escapeHtml(data.value)}`;
         }
       },
       events: {
@@ -254,7 +254,7 @@ function renderResults() {
         <h2>${escapeHtml(result.chunk.book_title)}</h2>
         <div class="meta">
           ${escapeHtml(result.chunk.chapter_title)}
-          ${tags.length > 0 ? `<br><span class="tags">${tags.join(', ')}</span>` : ''}
+          ${tags.length > 0 ? `<br><span class="tags">${escapeHtml(tags.join(', '))}</span>` : ''}
         </div>
       </a>
     `;
@@ -1,5 +1,19 @@
 import Fuse from 'fuse.js';
 
+/**
+ * Rebuild per-chunk objects from the columnar metadata.json layout
+ * (one array per field; chunk_id is the array index)
+ */
+export function chunksFromColumns(metadata) {
+  return metadata.content.map((content, i) => ({
+    chunk_id: i,
+    book_title: metadata.book_titles[metadata.book_title_idx[i]],
+    chapter_title: metadata.chapter_title[i],
+    tags: metadata.tags[i],
+    content
+  }));
+}
+
 /**
  * Search Engine Class
  * Handles keyword/fuzzy search with Fuse.js and tag filtering
@@ -31,6 +45,9 @@ export class SearchEngine {
         "/essay_search_engine/data/metadata.json",
       );
       this.metadata = await metadataResponse.json();
+      if (!this.metadata.chunks) {
+        this.metadata.chunks = chunksFromColumns(this.metadata);
+      }
 
       // Initialize Fuse.js with weighted fields
       if (onProgress) onProgress("Initializing search...");
@@ -1,13 +1,37 @@
 #!/usr/bin/env python3
 """
 Unified build script for essay search engine.
-Generates metadata.json, tags.json, tags.html, and embeddings.json.
+Generates metadata.json, tags.json, tags.html, embeddings (float16 binary) and version.json.
 """
 
+import argparse
+import hashlib
 import json
+import mmap
 import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from html import escape
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from urllib.parse import quote
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 # Paths
 TARGET_DIR = Path(__file__).parent.parent
@@ -17,6 +41,114 @@ OUTPUT_DIR = TARGET_DIR / "public" / "data"
 TAGS_OUTPUT = TARGET_DIR / "public" / "data" / "tags.json"
 TAGS_HTML = TARGET_DIR / "public" / "tags.html"
 
+EMBEDDING_MODEL = 'BAAI/bge-large-en-v1.5'
+
+# Embeddings from previous builds, keyed by a hash of each chunk's content,
+# so only new or edited chunks go through the model
+EMBEDDING_CACHE_FILE = TARGET_DIR / "private" / "embedding_cache.npz"
+
+# One-time int8 ONNX Runtime export of EMBEDDING_MODEL for --onnx
+ONNX_MODEL_DIR = TARGET_DIR / "private" / ".cache" / "bge-onnx-int8"
+
+# Below this many texts, worker start-up costs more than it saves
+MULTI_PROCESS_MIN_TEXTS = 256
+
+# Plain-string form of SOURCE_DIR for building per-book paths with os.path.join
+SOURCE_DIR_STR = os.fspath(SOURCE_DIR)
+
+# Read/write buffer for large JSON files (default is 8 KiB)
+IO_BUFFER_SIZE = 1 << 20
+
+# Serializes output while embeddings are generated alongside the other files
+PRINT_LOCK = threading.Lock()
+
+# Reused stdlib JSON codecs for when orjson is not installed
+JSON_DECODER = json.JSONDecoder()
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+JSON_INDENT_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, indent=2)
+
+if msgspec is not None:
+    class SourceChunk(msgspec.Struct):
+        """The chunks.json fields the site uses; other keys are skipped when decoding.
+
+        Fields may be null in chunks.json, so they are normalised on load.
+        """
+        chapter_title: str | None = None
+        tags: str | None = None
+        content: str | None = None
+
+    SOURCE_CHUNKS_DECODER = msgspec.json.Decoder(list[SourceChunk])
+
+def log(message):
+    """Print one message without interleaving it with the other build thread."""
+    with PRINT_LOCK:
+        print(message, flush=True)
+
+@contextmanager
+def mapped_file(path):
+    """Memory-map a file read-only and yield a zero-copy view of its bytes."""
+    with open(path, 'rb', buffering=0) as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            yield view
+
+def load_json(path):
+    """Read a JSON file, using orjson when it is installed."""
+    with mapped_file(path) as data:
+        if orjson is not None:
+            return orjson.loads(data)
+        return JSON_DECODER.decode(str(data, 'utf-8'))
+
+def dump_json(obj, path, indent=False):
+    """Write obj to path as UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        payload = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    else:
+        encoder = JSON_INDENT_ENCODER if indent else JSON_ENCODER
+        payload = encoder.encode(obj).encode('utf-8')
+    with open(path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        f.write(payload)
+
+def book_chunks_path(safe_title):
+    """Path to a book's chunks.json, as a string."""
+    return os.path.join(SOURCE_DIR_STR, safe_title, 'chunks.json')
+
+def load_book_chunks(book):
+    """Load one book's chunks.json, keeping only the fields the site uses.
+
+    Returns None if the book's chunks.json is missing.
+    """
+    chunks_file = book_chunks_path(book['safe_title'])
+
+    # Add minimal metadata (remove word_count, char_count, doc_id, author)
+    try:
+        if msgspec is not None:
+            with mapped_file(chunks_file) as data:
+                chunks = SOURCE_CHUNKS_DECODER.decode(data)
+            return [
+                {
+                    'book_title': book['title'],
+                    'chapter_title': chunk.chapter_title or '',
+                    'tags': chunk.tags or '',
+                    'content': chunk.content or ''
+                }
+                for chunk in chunks
+            ]
+
+        return [
+            {
+                'book_title': book['title'],
+                'chapter_title': chunk.get('chapter_title') or '',
+                'tags': chunk.get('tags') or '',
+                'content': chunk.get('content') or ''
+            }
+            for chunk in load_json(chunks_file)
+        ]
+    except FileNotFoundError:
+        return None
+
 def load_chunks():
     """Load all chunks from source books."""
     print("=" * 60)
@@ -26,32 +158,37 @@ def load_chunks():
         print(f"❌ Error: {METADATA_FILE} not found")
         return []
 
-    with open(METADATA_FILE, 'r') as f:
-        metadata = json.load(f)
-        books_metadata = metadata.get('books', [])
+    metadata = load_json(METADATA_FILE)
+    books_metadata = metadata.get('books', [])
+
+    # One directory listing instead of a stat per book
+    try:
+        with os.scandir(SOURCE_DIR) as entries:
+            book_dirs = {entry.name for entry in entries if entry.is_dir()}
+    except FileNotFoundError:
+        book_dirs = set()
+    present_books = [book for book in books_metadata if book['safe_title'] in book_dirs]
+
+    # Books are independent, so overlap their reads and parses
+    if len(present_books) > 1:
+        with ThreadPoolExecutor(max_workers=min(8, len(present_books))) as executor:
+            loaded = dict(zip(
+                (book['safe_title'] for book in present_books),
+                executor.map(load_book_chunks, present_books)
+            ))
+    else:
+        loaded = {book['safe_title']: load_book_chunks(book) for book in present_books}
 
     all_chunks = []
     global_chunk_id = 0
     for book in books_metadata:
-        book_dir = SOURCE_DIR / book['safe_title']
-        chunks_file = book_dir / 'chunks.json'
-
-        if not chunks_file.exists():
-            print(f"⚠️  Warning: {chunks_file} not found")
+        chunks = loaded.get(book['safe_title'])
+        if chunks is None:
+            print(f"⚠️  Warning: {book_chunks_path(book['safe_title'])} not found")
             continue
 
-        with open(chunks_file, 'r') as f:
-            chunks = json.load(f)
-
         for chunk in chunks:
-            # Add minimal metadata (remove word_count, char_count, doc_id, author)
-            all_chunks.append({
-                'chunk_id': global_chunk_id,
-                'book_title': book['title'],
-                'chapter_title': chunk.get('chapter_title', ''),
-                'tags': chunk.get('tags', ''),
-                'content': chunk.get('content', '')
-            })
+            all_chunks.append({'chunk_id': global_chunk_id, **chunk})
             global_chunk_id += 1
 
     print(f"✓ Loaded {len(all_chunks)} chunks from {len(books_metadata)} books")
@@ -59,63 +196,49 @@ def load_chunks():
 
 def generate_metadata(chunks):
     """Generate metadata.json."""
-    print("\nGenerating metadata.json...")
+    log("\nGenerating metadata.json...")
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+    # Columnar layout: one array per field instead of repeating every key
+    # in every chunk; chunk_id is the array index and each book title is
+    # stored once and referenced by position
+    # Transpose rows into columns in one C-level pass
+    columns = map(itemgetter('book_title', 'chapter_title', 'tags', 'content'), chunks)
+    chunk_book_titles, chapter_titles, tags, contents = zip(*columns) if chunks else ((),) * 4
+
+    book_titles = list(dict.fromkeys(chunk_book_titles))
+    book_index = {title: i for i, title in enumerate(book_titles)}
+
     metadata = {
         'total_chunks': len(chunks),
-        'chunks': chunks
+        'book_titles': book_titles,
+        'book_title_idx': list(map(book_index.__getitem__, chunk_book_titles)),
+        'chapter_title': chapter_titles,
+        'tags': tags,
+        'content': contents
     }
 
     output_file = OUTPUT_DIR / 'metadata.json'
-    with open(output_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    dump_json(metadata, output_file)
 
     size_mb = output_file.stat().st_size / (1024 * 1024)
-    print(f"✓ Generated metadata.json ({size_mb:.1f}MB)")
-
-def generate_tags(chunks):
-    """Generate tags.json and tags.html."""
-    print("\nGenerating tags data...")
-
-    # Collect all tags with counts
-    tag_counts = {}
-    for chunk in chunks:
-        if chunk.get('tags'):
-            tags = [t.strip() for t in chunk['tags'].split(',')]
-            for tag in tags:
-                if tag:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-
-    # Sort alphabetically
-    sorted_tags = sorted(tag_counts.items())
-
-    # Generate tags.json
-    tags_data = {
-        'total_tags': len(sorted_tags),
-        'tags': [{'tag': tag, 'count': count} for tag, count in sorted_tags]
-    }
-
-    with open(TAGS_OUTPUT, 'w') as f:
-        json.dump(tags_data, f, indent=2)
+    log(f"✓ Generated metadata.json ({size_mb:.1f}MB)")
 
-    print(f"✓ Generated tags.json ({len(sorted_tags)} unique tags)")
-
-    # Generate tags.html
-    html = f"""<!DOCTYPE html>
+# Static parts of tags.html; only the tag links vary per build
+TAGS_HTML_HEADER = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Browse Tags</title>
     <style>
-        body {{ max-width: 50rem; margin: 0 auto; padding: 1rem; font-family: system-ui; }}
-        h1 {{ font-size: 1.5rem; }}
-        .tag-list {{ display: flex; flex-wrap: wrap; gap: 0.5rem; }}
-        .tag {{ display: inline-block; padding: 0.25rem 0.5rem; background: #f0f0f0; border-radius: 4px; text-decoration: none; color: #333; }}
-        .tag:hover {{ background: #e0e0e0; }}
-        .count {{ color: #666; font-size: 0.875rem; }}
+        body { max-width: 50rem; margin: 0 auto; padding: 1rem; font-family: system-ui; }
+        h1 { font-size: 1.5rem; }
+        .tag-list { display: flex; flex-wrap: wrap; gap: 0.5rem; }
+        .tag { display: inline-block; padding: 0.25rem 0.5rem; background: #f0f0f0; border-radius: 4px; text-decoration: none; color: #333; }
+        .tag:hover { background: #e0e0e0; }
+        .count { color: #666; font-size: 0.875rem; }
     </style>
 </head>
 <body>
@@ -124,55 +247,310 @@ def generate_tags(chunks):
     <div class="tag-list">
 """
 
-    for tag, count in sorted_tags:
-        html += f'        <a href="/essay_search_engine/?tag={tag}" class="tag">{tag} <span class="count">({count})</span></a>\n'
-
-    html += """    </div>
+TAGS_HTML_FOOTER = """    </div>
 </body>
 </html>"""
 
-    with open(TAGS_HTML, 'w') as f:
-        f.write(html)
+def generate_tags(chunks):
+    """Generate tags.json and tags.html."""
+    log("\nGenerating tags data...")
 
-    print(f"✓ Generated tags.html")
+    # Collect all tags with counts
+    tag_counts = Counter()
+    for chunk in chunks:
+        if chunk.get('tags'):
+            tag_counts.update(filter(None, map(str.strip, chunk['tags'].split(','))))
 
-def generate_embeddings(chunks):
-    """Generate embeddings.json."""
-    print("\nGenerating embeddings...")
-    print("Loading BGE-large-en-v1.5 model...")
+    # Sort alphabetically
+    sorted_tags = sorted(tag_counts.items())
 
-    model = SentenceTransformer('BAAI/bge-large-en-v1.5')
+    # Generate tags.json
+    tags_data = {
+        'total_tags': len(sorted_tags),
+        'tags': [{'tag': tag, 'count': count} for tag, count in sorted_tags]
+    }
+
+    dump_json(tags_data, TAGS_OUTPUT, indent=True)
+
+    log(f"✓ Generated tags.json ({len(sorted_tags)} unique tags)")
+
+    # Generate tags.html
+    tag_links = []
+    for tag, count in sorted_tags:
+        tag_links.append(f'        <a href="/essay_search_engine/?tag={quote(tag, safe="")}" class="tag">{escape(tag)} <span class="count">({count})</span></a>\n')
+
+    html = ''.join([TAGS_HTML_HEADER, *tag_links, TAGS_HTML_FOOTER])
+    with open(TAGS_HTML, 'wb') as f:
+        f.write(html.encode('utf-8'))
+
+    log(f"✓ Generated tags.html")
+
+def load_onnx_model():
+    """Load an int8-quantized ONNX Runtime copy of the model for CPU.
+
+    The export and quantization run once; later builds load the saved
+    copy from ONNX_MODEL_DIR. Needs sentence-transformers[onnx].
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    # VNNI int8 kernels on x86, NEON on Apple Silicon / ARM
+    quantization = 'arm64' if platform.machine().lower() in ('arm64', 'aarch64') else 'avx512_vnni'
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    model_dir = os.fspath(ONNX_MODEL_DIR)
+
+    if not (ONNX_MODEL_DIR / file_name).exists():
+        log("Exporting model to quantized ONNX (one-time)...")
+        model = SentenceTransformer(EMBEDDING_MODEL, backend='onnx')
+        model.save(model_dir)
+        export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+
+    return SentenceTransformer(model_dir, backend='onnx', model_kwargs={'file_name': file_name})
+
+@lru_cache(maxsize=1)
+def get_model(onnx=False):
+    """Load the embedding model once, in half precision on a GPU."""
+    if onnx:
+        return load_onnx_model()
+
+    # Imported here so builds with nothing new to embed never pay for torch
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if torch.cuda.is_available():
+        device = 'cuda'
+    elif torch.backends.mps.is_available():
+        device = 'mps'
+    else:
+        device = 'cpu'
+
+    model = SentenceTransformer(EMBEDDING_MODEL, device=device)
+    if device != 'cpu':
+        model.half()
+    return model
+
+def dump_embeddings_json(embeddings, path):
+    """Write the legacy embeddings.json one row at a time.
+
+    Avoids materializing every vector as a list of Python floats; with
+    orjson each numpy row is serialized directly in C.
+    """
+    with open(path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        f.write(b'{"model":' + json.dumps(EMBEDDING_MODEL).encode('utf-8'))
+        f.write(b',"dimensions":%d,"total_chunks":%d,"embeddings":[' % (embeddings.shape[1], embeddings.shape[0]))
+        for i, row in enumerate(embeddings):
+            if i:
+                f.write(b',')
+            if orjson is not None:
+                f.write(orjson.dumps(row, option=orjson.OPT_SERIALIZE_NUMPY))
+            else:
+                f.write(JSON_ENCODER.encode(row.tolist()).encode('utf-8'))
+        f.write(b']}')
+
+def default_batch_size(model):
+    """Larger batches keep a GPU busy; small ones suit CPU inference."""
+    return 128 if model.device.type != 'cpu' else 16
+
+def embedding_key(text):
+    """Cache key for a chunk's embedding: a short hash of its content."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def load_embedding_cache(model_id):
+    """Load cached embeddings as (row keys, float16 matrix).
+
+    Keys and matrix live in one file, so they are always from the same build.
+    Returns ([], None) if there is no usable cache for model_id.
+    """
+    try:
+        with np.load(EMBEDDING_CACHE_FILE) as cache:
+            model = str(cache['model'])
+            keys = cache['keys'].tolist()
+            matrix = cache['embeddings']
+    except (FileNotFoundError, KeyError, ValueError, OSError):
+        return [], None
+
+    if model != model_id or len(keys) != len(matrix):
+        return [], None
+    return keys, matrix
+
+def save_embedding_cache(model_id, keys, embeddings):
+    """Replace the embedding cache with this build's rows."""
+    EMBEDDING_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = EMBEDDING_CACHE_FILE.with_name(EMBEDDING_CACHE_FILE.name + '.tmp')
+    with open(tmp_file, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        np.savez(f, model=np.array(model_id), keys=np.array(keys, dtype=str),
+                 embeddings=embeddings)
+    os.replace(tmp_file, EMBEDDING_CACHE_FILE)
+
+def encode_texts(model, texts, batch_size, multi_process=True):
+    """Encode texts into L2-normalized vectors.
+
+    Large CPU jobs are sharded across a few worker processes, since one
+    PyTorch process stops scaling well past ~8 intra-op threads. Small
+    jobs and GPU models use a single encode() call.
+    """
+    workers = min(4, (os.cpu_count() or 1) // 2)
+    if not multi_process or model.device.type != 'cpu' or workers < 2 or len(texts) < MULTI_PROCESS_MIN_TEXTS:
+        return model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=sys.stderr.isatty(),
+            convert_to_numpy=True,
+            normalize_embeddings=True  # CRITICAL: must match browser
+        )
+
+    # Split the cores between workers so they don't oversubscribe; spawned
+    # workers read OMP_NUM_THREADS when they import torch
+    previous_threads = os.environ.get('OMP_NUM_THREADS')
+    os.environ['OMP_NUM_THREADS'] = str(max(1, os.cpu_count() // workers))
+    try:
+        pool = model.start_multi_process_pool(['cpu'] * workers)
+    finally:
+        if previous_threads is None:
+            del os.environ['OMP_NUM_THREADS']
+        else:
+            os.environ['OMP_NUM_THREADS'] = previous_threads
+
+    try:
+        return model.encode_multi_process(
+            texts,
+            pool,
+            batch_size=batch_size,
+            normalize_embeddings=True  # CRITICAL: must match browser
+        )
+    finally:
+        model.stop_multi_process_pool(pool)
+
+def generate_embeddings(chunks, legacy_json=False, batch_size=None, int8=False, onnx=False):
+    """Generate embeddings.f16.bin (or .i8.bin) + embeddings.meta.json, or legacy embeddings.json.
+
+    Returns (output file, md5 of the embedding data written to it).
+    """
+    log("\nGenerating embeddings...")
 
     # Extract content for embedding
     texts = [chunk['content'] for chunk in chunks]
-
-    print(f"Embedding {len(texts)} chunks...")
-    embeddings = model.encode(
-        texts,
-        batch_size=32,
-        show_progress_bar=True,
-        normalize_embeddings=True  # CRITICAL: must match browser
-    )
-
-    # Convert to list of lists (JSON serializable)
-    embeddings_list = [emb.tolist() for emb in embeddings]
-
-    output_data = {
-        'model': 'BAAI/bge-large-en-v1.5',
-        'dimensions': len(embeddings_list[0]),
-        'total_chunks': len(embeddings_list),
-        'embeddings': embeddings_list
+    keys = [embedding_key(text) for text in texts]
+
+    # Quantized ONNX vectors differ slightly, so they get their own cache
+    model_id = f"{EMBEDDING_MODEL}:onnx-int8" if onnx else EMBEDDING_MODEL
+    cached_keys, cached = load_embedding_cache(model_id)
+    if cached is not None and cached_keys == keys:
+        # Nothing added, removed or reordered: use the cache as-is and
+        # skip merging and rewriting it
+        log(f"Reusing {len(keys)} cached embeddings")
+        embeddings = cached
+    else:
+        row_by_key = {key: row for row, key in enumerate(cached_keys)}
+        hits = [i for i, key in enumerate(keys) if key in row_by_key]
+        missing = [i for i, key in enumerate(keys) if key not in row_by_key]
+        log(f"Reusing {len(hits)} cached embeddings")
+
+        # Identical texts share a key, so each distinct one is encoded once
+        first_missing = {}
+        for i in missing:
+            first_missing.setdefault(keys[i], i)
+
+        new_embeddings = None
+        if missing:
+            log("Loading BGE-large-en-v1.5 model...")
+            model = get_model(onnx)
+
+            log(f"Embedding {len(first_missing)} chunks...")
+            new_embeddings = encode_texts(
+                model,
+                [texts[i] for i in first_missing.values()],
+                batch_size or default_batch_size(model),
+                multi_process=not onnx
+            )
+
+        dimensions = new_embeddings.shape[1] if new_embeddings is not None else cached.shape[1]
+        embeddings = np.empty((len(texts), dimensions), dtype=np.float16)
+        if hits:
+            embeddings[hits] = cached[[row_by_key[keys[i]] for i in hits]]
+        if missing:
+            new_row_by_key = {key: row for row, key in enumerate(first_missing)}
+            embeddings[missing] = new_embeddings[[new_row_by_key[keys[i]] for i in missing]]
+        del cached
+
+        save_embedding_cache(model_id, keys, embeddings)
+
+    if legacy_json:
+        output_file = OUTPUT_DIR / 'embeddings.json'
+        output_array = embeddings.astype(np.float32)
+        dump_embeddings_json(output_array, output_file)
+
+        size_mb = output_file.stat().st_size / (1024 * 1024)
+        log(f"✓ Generated embeddings.json ({size_mb:.1f}MB)")
+        return output_file, hashlib.md5(output_array.data).hexdigest()
+
+    header = {
+        'model': EMBEDDING_MODEL,
+        'dimensions': int(embeddings.shape[1]),
+        'total_chunks': int(embeddings.shape[0])
     }
 
-    output_file = OUTPUT_DIR / 'embeddings.json'
-    with open(output_file, 'w') as f:
-        json.dump(output_data, f)
+    if int8:
+        # Symmetric int8: components of a unit vector lie in [-1, 1], so a
+        # fixed scale of 1/127 keeps cosine ranking within ~1% of float
+        output_file = OUTPUT_DIR / 'embeddings.i8.bin'
+        quantized = np.rint(embeddings.astype(np.float32) * 127)
+        np.clip(quantized, -127, 127, out=quantized)
+        output_array = quantized.astype(np.int8)
+        header.update(dtype='int8', scale=1 / 127)
+    else:
+        # Raw row-major float16 matrix; vectors are L2-normalized so the
+        # precision loss (~1e-3) is well below retrieval noise
+        output_file = OUTPUT_DIR / 'embeddings.f16.bin'
+        output_array = embeddings
+        header.update(dtype='float16')
+
+    output_array.tofile(output_file)
+    # Hash the in-memory buffer rather than reading the file back
+    header['checksum'] = hashlib.md5(output_array.data).hexdigest()
+
+    dump_json(header, OUTPUT_DIR / 'embeddings.meta.json', indent=True)
 
     size_mb = output_file.stat().st_size / (1024 * 1024)
-    print(f"✓ Generated embeddings.json ({size_mb:.1f}MB)")
+    log(f"✓ Generated {output_file.name} ({size_mb:.1f}MB)")
+    return output_file, header['checksum']
+
+def generate_version_file(embeddings_file, checksum):
+    """Generate version.json so clients can tell when the embeddings changed.
+
+    Left untouched when the checksum matches, so its timestamp only moves
+    when the embeddings actually do.
+    """
+    version_file = OUTPUT_DIR / 'version.json'
+    try:
+        previous = load_json(version_file)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    if previous.get('checksum') == checksum:
+        print(f"✓ version.json unchanged ({checksum[:8]})")
+        return
+
+    version = {
+        'timestamp': int(time.time()),
+        'checksum': checksum,
+        'embeddings_size': os.stat(embeddings_file).st_size
+    }
+    dump_json(version, version_file, indent=True)
+
+    print(f"✓ Generated version.json ({checksum[:8]})")
 
 def main():
     """Main build process."""
+    parser = argparse.ArgumentParser(description='Build search data for the essay search engine')
+    parser.add_argument('--legacy-json', action='store_true',
+                        help='Write embeddings as embeddings.json float lists instead of float16 binary')
+    parser.add_argument('--int8', action='store_true',
+                        help='Quantize embeddings to int8 (embeddings.i8.bin) instead of float16')
+    parser.add_argument('--onnx', action='store_true',
+                        help='Embed on CPU with an int8-quantized ONNX Runtime model (needs sentence-transformers[onnx])')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Embedding batch size (default: 128 on GPU, 16 on CPU)')
+    args = parser.parse_args()
+
     print("\n" + "=" * 60)
     print("Essay Search Engine - Build Script")
     print("=" * 60 + "\n")
@@ -183,10 +561,31 @@ def main():
         print("\n❌ No chunks found. Run ./lib to process books first.")
         return 1
 
-    # Generate outputs
-    generate_metadata(chunks)
-    generate_tags(chunks)
-    generate_embeddings(chunks)
+    # Generate outputs; the JSON/HTML files are written in the background
+    # while embedding runs here (the model's forward pass releases the GIL).
+    # Keeping the long embedding pass on the main thread means Ctrl-C stops
+    # it at once and nothing waits on it at exit.
+    def write_site_files():
+        generate_metadata(chunks)
+        generate_tags(chunks)
+
+    def report_failure(future):
+        # Surface the error now; it is raised once embedding returns
+        if future.exception() is not None:
+            log(f"\n❌ Error writing metadata/tags: {future.exception()}")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        site_files_future = executor.submit(write_site_files)
+        site_files_future.add_done_callback(report_failure)
+        embeddings_file, checksum = generate_embeddings(
+            chunks,
+            legacy_json=args.legacy_json,
+            batch_size=args.batch_size,
+            int8=args.int8,
+            onnx=args.onnx
+        )
+        site_files_future.result()
+    generate_version_file(embeddings_file, checksum)
 
     print("\n" + "=" * 60)
     print("✓ Build complete!")